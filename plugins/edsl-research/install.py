@@ -7,9 +7,11 @@ Reads the version from plugin.json, copies the plugin source tree to:
 Usage:
   python install.py          # install current version
   python install.py --dry-run  # show what would be copied
+  python install.py --link     # hardlink files instead of copying them
 """
 
 import argparse
+import collections
 import json
 import os
 import shutil
@@ -17,6 +19,7 @@ import sys
 
 PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
 CACHE_BASE = os.path.expanduser("~/.claude/plugins/cache/ep-skills/edsl-research")
+SKIP_DIRS = frozenset({"__pycache__", ".git"})
 
 
 def get_version():
@@ -24,7 +27,80 @@ def get_version():
         return json.load(f)["version"]
 
 
-def install(dry_run=False):
+def _plugin_files(root):
+    """Return the installable file paths under root, relative to it."""
+    paths = []
+    stack = collections.deque([("", root)])
+    while stack:
+        prefix, path = stack.pop()
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append((prefix + entry.name + os.sep, entry.path))
+                elif entry.name != "install.py":
+                    paths.append(prefix + entry.name)
+    return paths
+
+
+def _tree_matches(src, dest, link=False):
+    """Check whether dest already holds src's files as `install` would write them.
+
+    Files must have the same size and mtime. They must also be hardlinks to
+    the source when `link` is set, and separate copies when it is not. Under
+    `link`, a copy still counts on another filesystem, where hardlinking
+    falls back to copying.
+    """
+    files = set(_plugin_files(src))
+    if files != set(_plugin_files(dest)):
+        return False
+    for rel in files:
+        s = os.stat(os.path.join(src, rel))
+        d = os.stat(os.path.join(dest, rel))
+        if s.st_size != d.st_size or s.st_mtime != d.st_mtime:
+            return False
+        same_file = s.st_dev == d.st_dev and s.st_ino == d.st_ino
+        if link:
+            if not same_file and s.st_dev == d.st_dev:
+                return False
+        elif same_file:
+            return False
+    return True
+
+
+def _reflink_or_copy(src, dst):
+    """Copy a file with os.copy_file_range where available, else shutil.copy2.
+
+    On Linux, copy_file_range lets Btrfs and XFS share extents (reflink)
+    instead of moving bytes.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+def _link_or_copy(src, dst):
+    """Hardlink a file, falling back to a copy (e.g. across filesystems)."""
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        return _reflink_or_copy(src, dst)
+
+
+def install(dry_run=False, link=False):
     version = get_version()
     dest = os.path.join(CACHE_BASE, version)
 
@@ -33,6 +109,9 @@ def install(dry_run=False):
     print(f"Dest:    {dest}")
 
     if os.path.exists(dest):
+        if not dry_run and _tree_matches(PLUGIN_DIR, dest, link=link):
+            print(f"\nCache is already up to date: {dest}")
+            return
         print(f"\nCache directory already exists: {dest}")
         print("Removing old cache and reinstalling...")
         if not dry_run:
@@ -41,22 +120,15 @@ def install(dry_run=False):
     if dry_run:
         print("\n[dry-run] Would copy plugin tree to cache.")
         # Show what would be copied
-        for root, dirs, files in os.walk(PLUGIN_DIR):
-            # Skip __pycache__ and .git
-            dirs[:] = [d for d in dirs if d not in ("__pycache__", ".git")]
-            rel = os.path.relpath(root, PLUGIN_DIR)
-            for f in files:
-                if f == "install.py":
-                    continue
-                src = os.path.join(rel, f) if rel != "." else f
-                print(f"  {src}")
+        sys.stdout.write("".join(f"  {src}\n" for src in _plugin_files(PLUGIN_DIR)))
         return
 
     # Copy the full plugin tree, excluding install.py itself
     shutil.copytree(
         PLUGIN_DIR,
         dest,
-        ignore=shutil.ignore_patterns("install.py", "__pycache__", ".git"),
+        ignore=shutil.ignore_patterns("install.py", *SKIP_DIRS),
+        copy_function=_link_or_copy if link else _reflink_or_copy,
     )
 
     print(f"\nInstalled edsl-research v{version} to cache.")
@@ -66,5 +138,8 @@ def install(dry_run=False):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Install edsl-research plugin to cache")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be copied")
+    parser.add_argument("--link", action="store_true",
+                        help="Hardlink files into the cache instead of copying "
+                             "(falls back to copying across filesystems)")
     args = parser.parse_args()
-    install(dry_run=args.dry_run)
+    install(dry_run=args.dry_run, link=args.link)
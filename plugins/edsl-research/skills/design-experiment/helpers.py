@@ -7,124 +7,285 @@ Subcommands:
 """
 
 import argparse
-import math
-import os
-import re
+import functools
 import sys
-from datetime import date
 
 
 # ---------------------------------------------------------------------------
 # Directory setup
 # ---------------------------------------------------------------------------
 
+class _SlugTable(dict):
+    """str.translate table for slugify, filled in on first use of each char.
+
+    Keeps [a-z0-9-], maps whitespace to a space and deletes everything else.
+    """
+
+    def __missing__(self, code):
+        char = chr(code)
+        if char in "abcdefghijklmnopqrstuvwxyz0123456789-":
+            value = char
+        elif char.isspace():
+            value = " "
+        else:
+            value = None
+        self[code] = value
+        return value
+
+
+_SLUG_TABLE = _SlugTable()
+
+
 def slugify(text: str, max_len: int = 50) -> str:
-    text = text.lower()
-    text = re.sub(r"[^a-z0-9\s-]", "", text)
-    text = re.sub(r"[\s]+", "-", text.strip())
+    text = "-".join(text.lower().translate(_SLUG_TABLE).split())
     if len(text) > max_len:
         text = text[: max_len].rsplit("-", 1)[0]
     return text
 
 
 def setup_dir(args):
+    import os
+    from datetime import date
+
     slug = slugify(args.question)
     dir_name = f"{date.today().isoformat()}_{slug}"
     full_path = os.path.join(args.base, dir_name)
-    os.makedirs(full_path, exist_ok=True)
-
     design_path = os.path.join(full_path, "experiment_design.md")
-    exists = os.path.exists(design_path)
 
-    print(dir_name)
-    if exists:
-        print("EXISTS")
-    else:
-        print("NEW")
+    # A single stat answers both questions when the study is already set up;
+    # only create the directory when the design file is missing.
+    try:
+        os.stat(design_path)
+        exists = True
+    except FileNotFoundError:
+        os.makedirs(full_path, exist_ok=True)
+        exists = False
+
+    sys.stdout.write(f"{dir_name}\n{'EXISTS' if exists else 'NEW'}\n")
 
 
 # ---------------------------------------------------------------------------
 # Power analysis
 # ---------------------------------------------------------------------------
 
-def _z(p):
+def _z_as241(p):
     """Inverse normal CDF (percent-point function) without scipy."""
-    # Rational approximation (Abramowitz & Stegun 26.2.23)
+    import math
+
+    # Wichura's algorithm AS241 (PPND16), accurate to about 1e-16
+    q = p - 0.5
+    if abs(q) <= 0.425:
+        r = 0.180625 - q * q
+        num = (((((((r * 2509.0809287301226727 +
+                     33430.575583588128105) * r + 67265.770927008700853) * r +
+                   45921.953931549871457) * r + 13731.693765509461125) * r +
+                 1971.5909503065514427) * r + 133.14166789178437745) * r +
+               3.387132872796366608)
+        den = (((((((r * 5226.495278852545925 +
+                     28729.085735721942674) * r + 39307.89580009271061) * r +
+                   21213.794301586595867) * r + 5394.1960214247511077) * r +
+                 687.1870074920579083) * r + 42.313330701600911252) * r + 1.0)
+        return q * num / den
+
+    # Take the log of the smaller tail so 1 - p never cancels near p = 1
+    r = math.sqrt(-math.log(min(p, 1.0 - p)))
+    if r <= 5.0:
+        r -= 1.6
+        num = (((((((r * 7.7454501427834140764e-4 +
+                     0.0227238449892691845833) * r + 0.24178072517745061177) * r +
+                   1.27045825245236838258) * r + 3.64784832476320460504) * r +
+                 5.7694972214606914055) * r + 4.6303378461565452959) * r +
+               1.42343711074968357734)
+        den = (((((((r * 1.05075007164441684324e-9 +
+                     5.475938084995344946e-4) * r + 0.0151986665636164571966) * r +
+                   0.14810397642748007459) * r + 0.68976733498510000455) * r +
+                 1.6763848301838038494) * r + 2.05319162663775882187) * r + 1.0)
+    else:
+        r -= 5.0
+        num = (((((((r * 2.01033439929228813265e-7 +
+                     2.71155556874348757815e-5) * r + 0.0012426609473880784386) * r +
+                   0.026532189526576123093) * r + 0.29656057182850489123) * r +
+                 1.7848265399172913358) * r + 5.4637849111641143699) * r +
+               6.6579046435011037772)
+        den = (((((((r * 2.04426310338993978564e-15 +
+                     1.4215117583164458887e-7) * r + 1.8463183175100546818e-5) * r +
+                   7.868691311456132591e-4) * r + 0.0148753612908506148525) * r +
+                 0.13692988092273580531) * r + 0.59983220655588793769) * r + 1.0)
+    val = num / den
+    return -val if q < 0 else val
+
+
+@functools.lru_cache(maxsize=None)
+def _ppf():
+    """Pick the inverse normal CDF backend on first use.
+
+    Prefers a C implementation: scipy's ndtri, then statistics.NormalDist
+    (Python 3.8+), then the pure-Python AS241 above.
+    """
+    try:
+        from scipy.special import ndtri
+        return ndtri
+    except ImportError:
+        pass
+    try:
+        from statistics import NormalDist
+        return NormalDist().inv_cdf
+    except ImportError:
+        return _z_as241
+
+
+# Exact quantiles (correctly rounded) for the conventional two-sided alpha
+# levels 0.001, 0.01, 0.05 and 0.1 and the usual power targets.
+_Z_TABLE = {
+    0.9995: 3.290526731491895,
+    0.995: 2.575829303548901,
+    0.99: 2.326347874040841,
+    0.975: 1.9599639845400543,
+    0.95: 1.6448536269514726,
+    0.9: 1.2815515655446004,
+    0.85: 1.0364333894937896,
+    0.8: 0.8416212335729142,
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _z(p):
+    """Inverse normal CDF (percent-point function)."""
     if p <= 0 or p >= 1:
         raise ValueError("p must be in (0, 1)")
-    if p < 0.5:
-        return -_z(1 - p)
-    t = math.sqrt(-2 * math.log(1 - p))
-    c0, c1, c2 = 2.515517, 0.802853, 0.010328
-    d1, d2, d3 = 1.432788, 0.189269, 0.001308
-    return t - (c0 + c1 * t + c2 * t * t) / (1 + d1 * t + d2 * t * t + d3 * t * t * t)
+    z = _Z_TABLE.get(p)
+    return z if z is not None else float(_ppf()(p))
+
+
+# The _n_* helpers broadcast over NumPy arrays of effect sizes and z values
+# and return int64 sample sizes. numpy is imported where it is used so that
+# setup-dir does not pay for it.
+
+def _ceil_sample_size(n):
+    """Round sample sizes up to int64, raising ValueError if any is undefined.
+
+    A zero effect size or a proportion outside [0, 1] makes the formula
+    inf or NaN, which int64 would silently turn into INT64_MIN.
+    """
+    import numpy as np
+
+    if not np.isfinite(n).all():
+        raise ValueError("sample size is undefined for these effect sizes")
+    return np.ceil(n).astype(np.int64)
+
+
+def _n_two_means(d, z_a, z_b):
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (z_a + z_b) / d
+    return _ceil_sample_size(t * t)
+
+
+def _n_two_proportions(p1, p2, z_a, z_b):
+    import numpy as np
+
+    p_bar = (p1 + p2) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (z_a * np.sqrt(2 * p_bar * (1 - p_bar)) +
+             z_b * np.sqrt(p1 * (1 - p1) + p2 * (1 - p2))) / (p1 - p2)
+    return _ceil_sample_size(t * t)
+
+
+def _n_anova(f, k, z_a, z_b):
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (z_a + z_b) / f
+    return _ceil_sample_size(t * t * (1 + (k - 1) * 0.1))
 
 
 def power_two_means(d, alpha=0.05, power=0.80):
     """Sample size per group for two-sample t-test."""
-    z_a = _z(1 - alpha / 2)
-    z_b = _z(power)
-    return math.ceil(((z_a + z_b) / d) ** 2)
+    return int(_n_two_means(d, _z(1 - alpha / 2), _z(power)))
 
 
 def power_two_proportions(p1, p2, alpha=0.05, power=0.80):
     """Sample size per group for two-proportion z-test."""
-    z_a = _z(1 - alpha / 2)
-    z_b = _z(power)
-    p_bar = (p1 + p2) / 2
-    n = ((z_a * math.sqrt(2 * p_bar * (1 - p_bar)) +
-          z_b * math.sqrt(p1 * (1 - p1) + p2 * (1 - p2))) / (p1 - p2)) ** 2
-    return math.ceil(n)
+    return int(_n_two_proportions(p1, p2, _z(1 - alpha / 2), _z(power)))
 
 
 def power_anova(f, k, alpha=0.05, power=0.80):
     """Per-group sample size for one-way ANOVA (approximate)."""
-    z_a = _z(1 - alpha / 2)
-    z_b = _z(power)
-    n = math.ceil(((z_a + z_b) / f) ** 2 * (1 + (k - 1) * 0.1))
-    return n
+    return int(_n_anova(f, k, _z(1 - alpha / 2), _z(power)))
+
+
+_ROW_FMT = "| {:.2f}  | {:14s} | {:9d} | {:7d} |".format
 
 
 def power_cmd(args):
+    import numpy as np
+
     rows = []
     test = args.test
+    # _z is cached, so each distinct quantile is computed once. Sample sizes
+    # for the whole (power x effect size) grid come from one broadcast.
+    z_a = _z(1 - args.alpha / 2)
+    z_b = np.array([_z(pw) for pw in args.power], dtype=np.float64)
+    effect = np.asarray(args.effect_size, dtype=np.float64)
+    if not np.isfinite(effect).all():
+        print("ERROR: --effect-size values must be finite", file=sys.stderr)
+        sys.exit(1)
 
     if test == "two-means":
-        for pw in args.power:
-            for d in args.effect_size:
-                n = power_two_means(d, alpha=args.alpha, power=pw)
-                cells = args.cells or 2
-                rows.append((pw, f"d={d}", n, n * cells))
+        if 0 in args.effect_size:
+            print("ERROR: two-means requires a nonzero --effect-size", file=sys.stderr)
+            sys.exit(1)
+        cells = args.cells or 2
+        N = _n_two_means(effect[None, :], z_a, z_b[:, None]).tolist()
+        for i, j in np.ndindex(len(args.power), len(args.effect_size)):
+            rows.append((args.power[i], f"d={args.effect_size[j]}",
+                         N[i][j], N[i][j] * cells))
     elif test == "two-proportions":
         if len(args.effect_size) < 2:
             print("ERROR: two-proportions requires --effect-size p1 p2", file=sys.stderr)
             sys.exit(1)
         p1, p2 = args.effect_size[0], args.effect_size[1]
-        for pw in args.power:
-            n = power_two_proportions(p1, p2, alpha=args.alpha, power=pw)
-            cells = args.cells or 2
+        if not (0 <= p1 <= 1 and 0 <= p2 <= 1):
+            print("ERROR: two-proportions requires p1 and p2 in [0, 1]", file=sys.stderr)
+            sys.exit(1)
+        if p1 == p2:
+            print("ERROR: two-proportions requires p1 != p2", file=sys.stderr)
+            sys.exit(1)
+        cells = args.cells or 2
+        N = _n_two_proportions(p1, p2, z_a, z_b).tolist()
+        for pw, n in zip(args.power, N):
             rows.append((pw, f"p1={p1},p2={p2}", n, n * cells))
     elif test == "anova":
+        if 0 in args.effect_size:
+            print("ERROR: anova requires a nonzero --effect-size", file=sys.stderr)
+            sys.exit(1)
         k = args.cells or 3
-        for pw in args.power:
-            for f_val in args.effect_size:
-                n = power_anova(f_val, k, alpha=args.alpha, power=pw)
-                rows.append((pw, f"f={f_val}", n, n * k))
+        N = _n_anova(effect[None, :], k, z_a, z_b[:, None]).tolist()
+        for i, j in np.ndindex(len(args.power), len(args.effect_size)):
+            rows.append((args.power[i], f"f={args.effect_size[j]}",
+                         N[i][j], N[i][j] * k))
     else:
         print(f"ERROR: unknown test '{test}'", file=sys.stderr)
         sys.exit(1)
 
     # Print markdown table
-    print("| Power | Effect Size | N per Cell | Total N |")
-    print("|-------|-------------|-----------|---------|")
-    for pw, es, n, total in rows:
-        print(f"| {pw:.2f}  | {es:14s} | {n:9d} | {total:7d} |")
+    lines = ["| Power | Effect Size | N per Cell | Total N |",
+             "|-------|-------------|-----------|---------|"]
+    lines += [_ROW_FMT(*row) for row in rows]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+_DISPATCH = {
+    "setup-dir": setup_dir,
+    "power": power_cmd,
+}
+
+
 def main():
     parser = argparse.ArgumentParser(description=__doc__,
                                      formatter_class=argparse.RawDescriptionHelpFormatter)
@@ -149,13 +310,11 @@ def main():
                        help="Number of cells/groups (default: 2 for means/proportions, 3 for anova)")
 
     args = parser.parse_args()
-    if args.command == "setup-dir":
-        setup_dir(args)
-    elif args.command == "power":
-        power_cmd(args)
-    else:
+    handler = _DISPATCH.get(args.command)
+    if handler is None:
         parser.print_help()
         sys.exit(1)
+    handler(args)
 
 
 if __name__ == "__main__":